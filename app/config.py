@@ -43,6 +43,11 @@ class Settings(BaseSettings):
     max_tokens: int = Field(
         4096, description="Máximo de tokens a generar en la respuesta."
     )
+    llm_cache_enabled: bool = Field(
+        False,
+        description="Cachea en memoria las respuestas de turnos deterministas. "
+        "Requiere además TEMPERATURE <= 0.1 (por defecto es 0.3).",
+    )
 
     # --- Configuración del Chat ---
     conversation_window_messages: int = Field(
@@ -4,11 +4,12 @@
 Manejador de archivos mejorado con validaciones y optimización.
 """
 
+import codecs
 import logging
+from collections.abc import Iterator
 from io import BytesIO
 
 import streamlit as st
-from pypdf import PdfReader
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +20,9 @@ MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
 # Tipos de archivo soportados
 SUPPORTED_EXTENSIONS = {"py", "txt", "md", "csv", "pdf"}
 
+# Cabecera obligatoria de un PDF
+PDF_MAGIC = b"%PDF-"
+
 
 class FileProcessor:
     """Clase para procesar archivos de forma segura y eficiente."""
@@ -51,13 +55,40 @@ class FileProcessor:
         return extension in SUPPORTED_EXTENSIONS
 
     @staticmethod
-    def _read_text_file(file_bytes: bytes) -> str:
+    def _read_text_file(file_bytes: bytes | memoryview) -> str:
         """Intenta leer un archivo de texto con UTF-8 y recurre a Latin-1 si falla."""
         try:
-            return file_bytes.decode("utf-8")
+            # utf_8_decode llama directamente al decodificador en C, sin búsqueda
+            # del codec; se descarta el BOM que añaden algunos editores (CSV).
+            content, _ = codecs.utf_8_decode(file_bytes, "strict", True)
+            return content.removeprefix("\ufeff")
         except UnicodeDecodeError:
             logger.warning("Fallo al decodificar con UTF-8, intentando con Latin-1.")
-            return file_bytes.decode("latin-1")
+            return str(file_bytes, "latin-1")
+
+    @staticmethod
+    def _iter_pdf_pages(file_bytes: bytes | memoryview) -> Iterator[str]:
+        """
+        Devuelve el texto de cada página de un PDF, de forma perezosa.
+
+        Usa los bloques de texto de PyMuPDF (sin análisis de maquetación) si está
+        instalado y recurre a pypdf en caso contrario. Las importaciones son
+        diferidas: solo se cargan si se sube un PDF.
+        """
+        try:
+            import fitz  # PyMuPDF
+        except ImportError:
+            from pypdf import PdfReader
+
+            for page in PdfReader(BytesIO(file_bytes)).pages:
+                yield page.extract_text() or ""
+            return
+
+        with fitz.open(stream=BytesIO(file_bytes), filetype="pdf") as doc:
+            for page in doc:
+                # Cada bloque: (x0, y0, x1, y1, texto, nº bloque, tipo); tipo 0 = texto
+                blocks = page.get_text("blocks")
+                yield "\n".join(block[4] for block in blocks if block[6] == 0)
 
     @staticmethod
     def extract_text_from_file(
@@ -66,15 +97,34 @@ class FileProcessor:
         """
         Extrae texto de un archivo según su tipo, con manejo robusto de codificación.
 
+        Se mantiene por compatibilidad; delega en `extract_text_from_buffer`.
+
         Args:
             uploaded_file: Archivo subido desde Streamlit.
 
         Returns:
             Tupla (contenido, error_mensaje).
         """
-        file_name = uploaded_file.name
+        return FileProcessor.extract_text_from_buffer(
+            uploaded_file.getbuffer(), uploaded_file.name
+        )
+
+    @staticmethod
+    def extract_text_from_buffer(
+        file_bytes: bytes | memoryview,
+        file_name: str,
+    ) -> tuple[str | None, str | None]:
+        """
+        Extrae texto del contenido de un archivo ya leído en memoria.
+
+        Args:
+            file_bytes: Contenido del archivo (se acepta un `memoryview` sin copiar).
+            file_name: Nombre del archivo, usado para determinar su tipo.
+
+        Returns:
+            Tupla (contenido, error_mensaje).
+        """
         file_extension = file_name.split(".")[-1].lower()
-        file_bytes = uploaded_file.getvalue()
 
         try:
             if file_extension in ["py", "txt", "md", "csv"]:
@@ -82,11 +132,15 @@ class FileProcessor:
                 return content, None
 
             elif file_extension == "pdf":
-                pdf_reader = PdfReader(BytesIO(file_bytes))
-                if not pdf_reader.pages:
+                # No confiar en la extensión: rechazar en O(1) lo que no es un PDF
+                if bytes(file_bytes[: len(PDF_MAGIC)]) != PDF_MAGIC:
+                    return None, "El archivo no es un PDF válido."
+
+                pages_text = list(FileProcessor._iter_pdf_pages(file_bytes))
+                if not pages_text:
                     return None, "El PDF está vacío o corrupto."
 
-                content = "\n".join(page.extract_text() or "" for page in pdf_reader.pages).strip()
+                content = "\n".join(pages_text).strip()
                 if not content:
                     return None, "No se pudo extraer texto del PDF (podría ser una imagen)."
                 return content, None
@@ -116,7 +170,9 @@ def process_uploaded_file(
         return None, "No se ha subido ningún archivo."
 
     file_name = uploaded_file.name
-    file_size = uploaded_file.size
+    # Un único acceso al buffer: sirve para validar el tamaño y para extraer el texto
+    file_buffer = uploaded_file.getbuffer()
+    file_size = len(file_buffer)
 
     # Validar tamaño
     if not FileProcessor.validate_file_size(file_size):
@@ -132,7 +188,7 @@ def process_uploaded_file(
         return None, f"Tipo de archivo no soportado: {file_name}"
 
     # Procesar archivo
-    content, error = FileProcessor.extract_text_from_file(uploaded_file)
+    content, error = FileProcessor.extract_text_from_buffer(file_buffer, file_name)
 
     if content:
         logger.info(f"Archivo procesado exitosamente: {file_name} ({len(content)} caracteres)")
@@ -1,11 +1,13 @@
 import getpass
 
-import bcrypt
+from passlib.hash import argon2
+
+from app.core.hashing import ARGON2_MEMORY_COST, ARGON2_PARALLELISM, ARGON2_TIME_COST
 
 
 def generate_hash() -> None:
     """
-    Genera un hash seguro para una contraseña usando bcrypt.
+    Genera un hash seguro para una contraseña usando Argon2id.
     """
     try:
         # Usar getpass para que la contraseña no se muestre en la terminal
@@ -15,14 +17,18 @@ def generate_hash() -> None:
             return
 
         # Generar el hash
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        hashed_password = argon2.using(
+            memory_cost=ARGON2_MEMORY_COST,
+            time_cost=ARGON2_TIME_COST,
+            parallelism=ARGON2_PARALLELISM,
+        ).hash(password)
         
         print("\n¡Hash generado con éxito!")
         print(
             "Copia la siguiente línea completa y pégala en tu archivo .env "
             "como el valor de MASTER_PASSWORD_HASH:\n"
         )
-        print(f"{hashed_password.decode('utf-8')}")
+        print(hashed_password)
 
     except Exception as e:
         print(f"\nOcurrió un error al generar el hash: {e}")
@@ -0,0 +1,13 @@
+# hashing.py
+
+"""
+Parámetros de Argon2id compartidos por la aplicación y el generador de hashes.
+
+No importa Streamlit ni la configuración, para poder usarse desde la terminal.
+"""
+
+from typing import Final
+
+ARGON2_MEMORY_COST: Final = 65536  # KiB
+ARGON2_TIME_COST: Final = 3
+ARGON2_PARALLELISM: Final = 2
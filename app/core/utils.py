@@ -4,36 +4,85 @@ Utilidades de seguridad y validación para el agente Python.
 
 import logging
 import secrets
+from bisect import bisect_right
 from functools import lru_cache
+from typing import TYPE_CHECKING
 
-import bcrypt
 import streamlit as st
 from streamlit.runtime.scriptrunner import get_script_run_ctx
 
+from app.core.hashing import ARGON2_MEMORY_COST, ARGON2_PARALLELISM, ARGON2_TIME_COST
 from app.db.persistence import count_recent_login_attempts, record_login_attempt
 
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=1)
+def get_pwd_context() -> "CryptContext":
+    """
+    Devuelve el contexto de hashing de contraseñas, importando passlib al primer uso.
+
+    Solo gestiona Argon2id: los hashes bcrypt heredados se verifican aparte con
+    `bcrypt.checkpw` (ver `_is_legacy_bcrypt`).
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["argon2"],
+        argon2__memory_cost=ARGON2_MEMORY_COST,
+        argon2__time_cost=ARGON2_TIME_COST,
+        argon2__parallelism=ARGON2_PARALLELISM,
+    )
+
+
+# Prefijos de los hashes bcrypt ($2a$, $2b$, $2y$) generados antes de Argon2id
+_BCRYPT_PREFIX = "$2"
+
+
+def _is_legacy_bcrypt(hashed_password: str) -> bool:
+    """Indica si el hash es un bcrypt heredado.
+
+    Se comprueban con `bcrypt` directamente: el backend bcrypt de passlib 1.7.4
+    registra una traza de `AttributeError` con bcrypt>=4.1 en la primera carga.
+    """
+    return hashed_password.startswith(_BCRYPT_PREFIX)
+
+
 class SecurityUtils:
     """Clase para manejar funciones de seguridad."""
 
     @staticmethod
     def hash_password(password: str) -> str:
-        """Genera un hash de la contraseña usando bcrypt."""
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password.encode("utf-8"), salt)
-        return hashed.decode("utf-8")
+        """Genera un hash de la contraseña usando el esquema por defecto (Argon2id)."""
+        return str(get_pwd_context().hash(password))
 
     @staticmethod
     def is_password_valid(password: str, hashed_password: str) -> bool:
         """Verifica si una contraseña coincide con su hash."""
+        # Evita el coste del hash con envíos vacíos
+        if not password or not hashed_password:
+            return False
         try:
-            return bcrypt.checkpw(
-                password.encode("utf-8"), hashed_password.encode("utf-8")
-            )
+            if _is_legacy_bcrypt(hashed_password):
+                import bcrypt
+
+                return bcrypt.checkpw(password.encode(), hashed_password.encode())
+            return bool(get_pwd_context().verify(password, hashed_password))
+        except (ValueError, TypeError):
+            return False
+
+    @staticmethod
+    def needs_rehash(hashed_password: str) -> bool:
+        """Indica si el hash usa un esquema o parámetros obsoletos."""
+        if _is_legacy_bcrypt(hashed_password):
+            return True
+        try:
+            return bool(get_pwd_context().needs_update(hashed_password))
         except (ValueError, TypeError):
             return False
 
@@ -41,7 +90,14 @@ class SecurityUtils:
     @lru_cache(maxsize=128)
     def verify_password(password: str, hashed_password: str) -> bool:
         """Wrapper con cache para verificar contraseñas."""
-        return SecurityUtils.is_password_valid(password, hashed_password)
+        is_valid = SecurityUtils.is_password_valid(password, hashed_password)
+        if is_valid and SecurityUtils.needs_rehash(hashed_password):
+            # El hash vive en el .env: la migración la completa el administrador.
+            logger.warning(
+                "MASTER_PASSWORD_HASH usa un esquema obsoleto. Genera uno nuevo "
+                "con 'python -m app.core.generate_hash' y actualiza el .env."
+            )
+        return is_valid
 
     @staticmethod
     def generate_session_token() -> str:
@@ -58,11 +114,15 @@ class RateLimiter:
 
     def is_allowed(self, identifier: str) -> bool:
         """Verifica si un intento está permitido consultando la base de datos."""
+        return self.remaining(identifier) > 0
+
+    def remaining(self, identifier: str) -> int:
+        """Devuelve cuántos intentos quedan en la ventana actual."""
         if not identifier or identifier == "unknown":
-            return True  # No limitar si no hay identificador
+            return self.max_attempts  # No limitar si no hay identificador
 
         recent_attempts = count_recent_login_attempts(identifier, self.window_minutes)
-        return recent_attempts < self.max_attempts
+        return max(0, self.max_attempts - recent_attempts)
 
     def record_attempt(self, identifier: str) -> None:
         """Registra un intento de login en la base de datos."""
@@ -101,25 +161,47 @@ def validate_file_size(file_size: int, max_size_mb: int = 5) -> bool:
     return file_size <= max_bytes
 
 
-def chunk_text(text: str, chunk_size: int) -> list[str]:
-    """Divide texto en trozos de tamaño máximo chunk_size.
+def _newline_positions(text: str) -> list[int]:
+    """Devuelve las posiciones de todos los saltos de línea en una sola pasada."""
+    positions: list[int] = []
+    pos = text.find("\n")
+    while pos != -1:
+        positions.append(pos)
+        pos = text.find("\n", pos + 1)
+    return positions
+
+
+def chunk_bounds(text: str, chunk_size: int) -> list[tuple[int, int]]:
+    """Calcula los límites (inicio, fin) de los trozos de tamaño máximo chunk_size.
 
     Se intenta cortar en saltos de línea si es posible para mejorar legibilidad.
+    Las posiciones de los saltos se calculan una sola vez y se buscan con
+    bisección, en lugar de recorrer cada trozo con `rfind`. Solo se devuelven
+    enteros: el texto de cada trozo se extrae bajo demanda.
     """
-    if chunk_size <= 0 or not text:
-        return [text] if text else []
-    chunks: list[str] = []
-    i = 0
+    if not text:
+        return []
     n = len(text)
+    if chunk_size <= 0:
+        return [(0, n)]
+    newlines = _newline_positions(text)
+    min_split = int(0.6 * chunk_size)
+    bounds: list[tuple[int, int]] = []
+    i = 0
     while i < n:
         end = min(i + chunk_size, n)
-        # buscar el último salto de línea antes de end para no cortar palabras/código
-        newline_pos = text.rfind("\n", i, end)
-        if newline_pos != -1 and newline_pos > i + int(0.6 * chunk_size):
-            end = newline_pos
-        chunks.append(text[i:end])
+        # último salto de línea antes de end para no cortar palabras/código
+        idx = bisect_right(newlines, end - 1) - 1
+        if idx >= 0 and newlines[idx] > i + min_split:
+            end = newlines[idx]
+        bounds.append((i, end))
         i = end
-    return chunks
+    return bounds
+
+
+def chunk_text(text: str, chunk_size: int) -> list[str]:
+    """Divide texto en trozos de tamaño máximo chunk_size (ver `chunk_bounds`)."""
+    return [text[start:end] for start, end in chunk_bounds(text, chunk_size)]
 
 def estimate_tokens(text: str) -> int:
     """Estimación simple de tokens (~4 chars/token)."""
@@ -7,7 +7,7 @@ Módulo de base de datos mejorado con índices, pooling y optimización.
 import logging
 import os
 import sqlite3
-from collections.abc import Iterator
+from collections.abc import Iterable, Iterator
 from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import Any
@@ -110,6 +110,30 @@ def init_db(db_path: str = DB_PATH) -> None:
         raise
 
 
+def get_metadata(key: str) -> str | None:
+    """Devuelve el valor guardado en la tabla de metadata para `key`, si existe."""
+    with get_db_connection() as conn:
+        cursor = conn.execute("SELECT value FROM metadata WHERE key = ?", (key,))
+        row = cursor.fetchone()
+    return row["value"] if row else None
+
+
+def set_metadata(key: str, value: str) -> None:
+    """Crea o actualiza un valor en la tabla de metadata."""
+    with get_db_connection() as conn:
+        conn.execute(
+            """
+            INSERT INTO metadata (key, value, updated_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(key) DO UPDATE SET
+                value = excluded.value,
+                updated_at = excluded.updated_at
+            """,
+            (key, value),
+        )
+        conn.commit()
+
+
 def record_login_attempt(identifier: str) -> None:
     """Registra un intento de inicio de sesión en la base de datos."""
     with get_db_connection() as conn:
@@ -154,6 +178,18 @@ def save_message(role: str, content: str) -> None:
         conn.commit()
 
 
+def save_messages(rows: Iterable[tuple[str, str]]) -> None:
+    """
+    Guarda varios mensajes en una sola transacción.
+
+    Args:
+        rows: Pares (rol, contenido) en el orden en que deben insertarse.
+    """
+    with get_db_connection() as conn:
+        conn.executemany("INSERT INTO messages (role, content) VALUES (?, ?)", rows)
+        conn.commit()
+
+
 def load_messages(limit: int = 20) -> list[dict[str, Any]]:
     """
     Carga los últimos 'limit' mensajes desde la base de datos para mantener
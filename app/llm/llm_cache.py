@@ -0,0 +1,55 @@
+# llm_cache.py
+
+"""
+Caché en memoria de respuestas del LLM para turnos deterministas.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any
+
+# Por encima de esta temperatura las respuestas no son reproducibles y no se cachean
+CACHEABLE_MAX_TEMPERATURE = 0.1
+
+
+class ResponseCache:
+    """Caché LRU de respuestas completas, indexada por el SHA-256 de la petición."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        # Streamlit atiende cada sesión en su propio hilo
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(payload: dict[str, Any]) -> str:
+        """Calcula una clave estable para la petición (modelo, mensajes, parámetros)."""
+        serialized = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """Devuelve la respuesta cacheada, o None si no existe."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        """Guarda una respuesta, descartando la menos usada si se supera `maxsize`."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Vacía la caché."""
+        with self._lock:
+            self._entries.clear()
+
+
+# Instancia global compartida por todas las sesiones del proceso
+response_cache = ResponseCache()
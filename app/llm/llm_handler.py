@@ -4,18 +4,33 @@
 Módulo para manejar la interacción con el modelo de lenguaje (Groq API).
 """
 
+from __future__ import annotations
+
 import logging
-from collections.abc import Generator, Iterator
+import time
+from itertools import islice
+from typing import TYPE_CHECKING
 
 import streamlit as st
-from groq import APIStatusError, Groq
-from groq.types.chat import ChatCompletionChunk, ChatCompletionMessageParam
 
 from app.config import settings
+from app.llm.llm_cache import CACHEABLE_MAX_TEMPERATURE, response_cache
+from app.llm.prompts import get_file_context_prompt
+
+# `groq` es una importación pesada: solo se carga al crear el cliente
+if TYPE_CHECKING:
+    from collections.abc import Generator, Iterable, Iterator, Sequence
+
+    from groq import Groq
+    from groq.types.chat import ChatCompletionChunk, ChatCompletionMessageParam
 
 # Configuración del logger
 logger = logging.getLogger(__name__)
 
+# Agrupación de fragmentos del stream antes de enviarlos a la UI
+STREAM_FLUSH_MAX_DELTAS = 32
+STREAM_FLUSH_INTERVAL_S = 0.04
+
 
 @st.cache_resource
 def get_groq_client() -> Groq:
@@ -27,63 +42,136 @@ def get_groq_client() -> Groq:
     """
     if not settings.groq_api_key:
         raise ValueError("La API key de Groq no está configurada.")
-    return Groq(api_key=settings.groq_api_key)
+
+    import httpx
+    from groq import Groq
+
+    # Un único cliente HTTP/2 con keep-alive para todo el proceso: las sesiones
+    # reutilizan la conexión TLS y los streams se multiplexan sobre ella.
+    http_client = httpx.Client(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=16),
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
+    return Groq(api_key=settings.groq_api_key, http_client=http_client)
 
 
 def build_messages_with_limit(
-    messages: list[dict[str, str]], max_chars: int
+    system_prompt: str,
+    history: Sequence[dict[str, str]],
+    max_chars: int,
+    history_chars: int | None = None,
 ) -> list[ChatCompletionMessageParam]:
     """
     Construye la lista de mensajes para la API sin exceder un límite de caracteres.
-    
-    Conserva el primer mensaje (sistema) y trunca los más antiguos del historial.
-    """
-    if not messages:
-        return []
 
-    system_message = messages[0]
-    history = messages[1:]
-    
-    char_count = 0
-    selected_history: list[dict[str, str]] = []
+    El prompt del sistema va siempre primero; del historial se descartan los
+    mensajes más antiguos hasta que el resto cabe en `max_chars`. Si el llamador
+    mantiene el total de caracteres del historial (`history_chars`), no hace
+    falta recorrerlo entero: solo se visitan los mensajes descartados.
+    """
+    if history_chars is None:
+        history_chars = sum(len(m.get("content", "")) for m in history)
 
-    for message in reversed(history):
-        message_len = len(message.get("content", ""))
-        if char_count + message_len > max_chars:
+    start = 0
+    for m in history:
+        if history_chars <= max_chars:
             break
-        selected_history.append(message)
-        char_count += message_len
-    
-    # Revertir para mantener el orden cronológico
-    final_history = list(reversed(selected_history))
-    
+        history_chars -= len(m.get("content", ""))
+        start += 1
+
     # Convertir a ChatCompletionMessageParam para compatibilidad con la API
     # Esta conversión asume que los roles y contenidos son correctos.
     final_messages: list[ChatCompletionMessageParam] = [
-        {"role": m["role"], "content": m["content"]} # type: ignore
-        for m in [system_message] + final_history
+        {"role": "system", "content": system_prompt}
     ]
-    
+    final_messages.extend(
+        {"role": m["role"], "content": m["content"]}  # type: ignore
+        for m in islice(history, start, None)
+    )
+
     return final_messages
 
 
+def _coalesce_deltas(deltas: Iterable[str]) -> Iterator[str]:
+    """
+    Agrupa los fragmentos del stream para no re-renderizar la UI por cada token.
+
+    El primer fragmento se emite de inmediato; los siguientes se acumulan hasta
+    reunir `STREAM_FLUSH_MAX_DELTAS` o pasar `STREAM_FLUSH_INTERVAL_S` segundos
+    desde el último envío. Lo pendiente se emite siempre al terminar el stream.
+    """
+    pending: list[str] = []
+    last_flush = float("-inf")
+    for delta in deltas:
+        pending.append(delta)
+        now = time.monotonic()
+        if (
+            len(pending) >= STREAM_FLUSH_MAX_DELTAS
+            or now - last_flush > STREAM_FLUSH_INTERVAL_S
+        ):
+            yield "".join(pending)
+            pending.clear()
+            last_flush = now
+    if pending:
+        yield "".join(pending)
+
+
 def get_groq_response(
-    client: Groq, messages: list[dict[str, str]]
+    client: Groq,
+    system_prompt: str,
+    history: Sequence[dict[str, str]],
+    file_context: str | None = None,
+    history_chars: int | None = None,
 ) -> Generator[str, None, None]:
     """
     Obtiene una respuesta en streaming de la API de Groq.
 
     Args:
         client: El cliente de la API de Groq.
-        messages: La lista de mensajes de la conversación.
+        system_prompt: El prompt del sistema del modo activo.
+        history: Los mensajes de la conversación, sin el prompt del sistema.
+        file_context: Contenido del archivo adjunto. Se envía como un mensaje de
+            sistema justo después del prompt estático, que así no cambia entre
+            turnos y aprovecha el cacheo de prefijos del proveedor.
+        history_chars: Total de caracteres de `history`, si el llamador lo
+            mantiene de forma incremental.
 
     Yields:
         str: Fragmentos de la respuesta del modelo.
     """
+    from groq import APIStatusError
+
     try:
         messages_to_send = build_messages_with_limit(
-            messages, settings.messages_max_chars
+            system_prompt, history, settings.messages_max_chars, history_chars
+        )
+        if file_context:
+            messages_to_send.insert(
+                1,
+                {"role": "system", "content": get_file_context_prompt(file_context)},
+            )
+
+        # Solo los turnos deterministas admiten reutilizar una respuesta previa
+        use_cache = (
+            settings.llm_cache_enabled
+            and settings.temperature <= CACHEABLE_MAX_TEMPERATURE
         )
+        cache_key = ""
+        if use_cache:
+            cache_key = response_cache.make_key(
+                {
+                    "model": settings.groq_model_name,
+                    "messages": messages_to_send,
+                    "temperature": settings.temperature,
+                    "max_tokens": settings.max_tokens,
+                }
+            )
+            cached_response = response_cache.get(cache_key)
+            if cached_response is not None:
+                logger.info("Respuesta servida desde la caché del LLM.")
+                yield cached_response
+                return
 
         stream: Iterator[ChatCompletionChunk] = client.chat.completions.create(
             model=settings.groq_model_name,
@@ -93,10 +181,17 @@ def get_groq_response(
             max_tokens=settings.max_tokens,
         )
 
-        for chunk in stream:
-            content = chunk.choices[0].delta.content
-            if content:
-                yield content
+        # Solo se acumula la respuesta si hay que guardarla en la caché; el texto
+        # completo para la UI lo materializa `st.write_stream` en el llamador.
+        parts: list[str] = []
+        deltas = (chunk.choices[0].delta.content for chunk in stream)
+        for content in _coalesce_deltas(delta for delta in deltas if delta):
+            if use_cache:
+                parts.append(content)
+            yield content
+
+        if use_cache and parts:
+            response_cache.set(cache_key, "".join(parts))
 
     except APIStatusError as e:
         error_message = f"Error de la API de Groq: {e.message}"
@@ -7,6 +7,7 @@ Define configuraciones especializadas para diferentes roles técnicos.
 from __future__ import annotations
 
 from enum import StrEnum
+from functools import lru_cache
 from typing import Final
 
 
@@ -207,19 +208,34 @@ SYSTEM_PROMPTS: Final[dict[AgentMode, str]] = {
 }
 
 
+# --- Delimitadores del Contexto de Archivo ---
+
+FILE_CONTEXT_OPEN: Final[str] = "--- INICIO DEL CONTEXTO DEL ARCHIVO ADJUNTO ---\n"
+FILE_CONTEXT_CLOSE: Final[str] = "\n--- FIN DEL CONTEXTO ---"
+
+
 # --- Funciones de Validación y Acceso ---
 
+@lru_cache(maxsize=1)
+def get_file_context_prompt(file_context: str) -> str:
+    """Delimita el contenido de un archivo adjunto para enviarlo al modelo.
+
+    Se cachea el último resultado: mientras no cambie el archivo (o la parte
+    seleccionada) no se vuelve a copiar su contenido en cada envío.
+    """
+    return "".join((FILE_CONTEXT_OPEN, file_context, FILE_CONTEXT_CLOSE))
+
+
 def get_system_prompt(mode: AgentMode, file_context: str | None = None) -> str:
-    """Construye el prompt del sistema final, añadiendo contexto de archivo si se proporciona."""
+    """Construye el prompt del sistema, con el contexto de archivo si se proporciona.
+
+    El chat no pasa `file_context`: envía el archivo como un mensaje de sistema
+    aparte para que el prefijo estático del prompt se pueda cachear en el proveedor.
+    """
     base_prompt = SYSTEM_PROMPTS[mode]
 
     if file_context:
-        context_prompt = (
-            "\n\n--- INICIO DEL CONTEXTO DEL ARCHIVO ADJUNTO ---\n"
-            f"{file_context}\n"
-            "--- FIN DEL CONTEXTO ---"
-        )
-        return f"{base_prompt}{context_prompt}"
+        return f"{base_prompt}\n\n{get_file_context_prompt(file_context)}"
 
     return base_prompt
 
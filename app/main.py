@@ -9,6 +9,8 @@ from __future__ import annotations
 
 # 1. Importaciones de la biblioteca estándar
 import logging
+import time
+from collections import deque
 from typing import Any
 
 # 2. Importaciones de terceros
@@ -19,9 +21,11 @@ from streamlit.errors import StreamlitAPIException
 from app.config import settings
 from app.core.utils import SecurityUtils, get_client_ip, rate_limiter
 from app.db.persistence import (
+    get_metadata,
     init_db,
     purge_old_login_attempts,
     purge_old_messages,
+    set_metadata,
 )
 from app.llm.llm_handler import get_groq_client
 from app.styles import load_css
@@ -67,14 +71,22 @@ def initialize_session_state() -> None:
 
     defaults: dict[str, Any] = {
         "auth": False,
-        "messages": [],
+        "auth_token": None,
+        "login_remaining": None,
+        "system_prompt": "",
+        "messages": deque(),
+        "messages_seeded": False,
+        "history_version": 0,
+        "history_chars": 0,
         "thread_id": None,
         "assistant_id": None,
         "run_id": None,
         "file_tokens_limit": settings.file_context_max_tokens,
         "file_context": None,
         "file_context_full": None,
-        "file_chunks": None,
+        "file_full_len": 0,
+        "file_chunk_bounds": None,
+        "chunk_cfg": None,
         "file_chunk_index": 0,
         "chunk_by_tokens": False,
         "auto_advance_chunks": False,
@@ -93,6 +105,34 @@ def initialize_session_state() -> None:
             st.session_state.client = None
 
 
+# ------------------------------------------------------------------
+# 3. Base de datos
+# ------------------------------------------------------------------
+# Intervalo mínimo entre purgas, también entre reinicios del proceso (p. ej. recargas)
+PURGE_INTERVAL_SECONDS = 3600
+
+
+@st.cache_resource(show_spinner=False)
+def bootstrap_db() -> bool:
+    """
+    Inicializa la base de datos y ejecuta las purgas de mantenimiento.
+
+    Streamlit re-ejecuta este script en cada interacción; `cache_resource`
+    garantiza que esto ocurra una sola vez por proceso del servidor. Además, la
+    purga se omite si ya se ejecutó hace menos de `PURGE_INTERVAL_SECONDS`.
+    """
+    init_db(settings.db_path)
+
+    last_purge = get_metadata("last_purge_ts")
+    now = time.time()
+    if last_purge is None or now - float(last_purge) > PURGE_INTERVAL_SECONDS:
+        # Purga de datos de mantenimiento
+        purge_old_messages(days=settings.purge_db_days)
+        purge_old_login_attempts(days=7)  # Limpia logs de intentos de login antiguos
+        set_metadata("last_purge_ts", str(now))
+    return True
+
+
 # ------------------------------------------------------------------
 # 4. Autenticación
 # ------------------------------------------------------------------
@@ -100,10 +140,18 @@ def handle_authentication() -> bool:
     """Maneja la autenticación del usuario."""
     client_ip: str = st.session_state.client_ip
 
-    if st.session_state.get("auth", False):
+    # Sesión ya autenticada: no se vuelve a verificar la contraseña
+    if st.session_state.get("auth", False) and st.session_state.get("auth_token"):
         return True
 
-    if not rate_limiter.is_allowed(client_ip):
+    # El contador en sesión solo sirve para el aviso en pantalla: los intentos se
+    # cuentan por IP entre todas las sesiones, y se vuelven a comprobar al enviar.
+    remaining: int | None = st.session_state.get("login_remaining")
+    if remaining is None or remaining <= 0:
+        remaining = rate_limiter.remaining(client_ip)
+        st.session_state.login_remaining = remaining
+
+    if remaining <= 0:
         st.error("Demasiados intentos de inicio de sesión. Inténtalo de nuevo más tarde.")
         return False
 
@@ -111,16 +159,34 @@ def handle_authentication() -> bool:
     password: str | None = st.text_input("Contraseña:", type="password")
 
     if st.button("Iniciar sesión"):
-        # Verificar la contraseña solo si se ingresa algo
-        if password and SecurityUtils.verify_password(
+        # Un envío vacío no llega a calcular el hash
+        if not password:
+            st.error("Introduce una contraseña.")
+            return False
+
+        # Otras sesiones desde la misma IP pueden haber agotado los intentos
+        if not rate_limiter.is_allowed(client_ip):
+            st.session_state.login_remaining = 0
+            st.error(
+                "Demasiados intentos de inicio de sesión. "
+                "Inténtalo de nuevo más tarde."
+            )
+            return False
+
+        if SecurityUtils.verify_password(
             password, settings.master_password_hash
         ):
             st.session_state.auth = True
+            st.session_state.auth_token = SecurityUtils.generate_session_token()
             st.rerun()
         else:
             st.session_state.auth = False
             rate_limiter.record_attempt(client_ip)
-            st.error("Contraseña incorrecta.")
+            st.session_state.login_remaining = rate_limiter.remaining(client_ip)
+            st.error(
+                "Contraseña incorrecta. Intentos restantes: "
+                f"{st.session_state.login_remaining}."
+            )
             # No hacer rerun aquí para que el mensaje de error permanezca visible
 
     return bool(st.session_state.get("auth", False))
@@ -146,12 +212,7 @@ def main() -> None:
 if __name__ == "__main__":
     setup_logging()
     try:
-        init_db(settings.db_path)
-        # Purga de datos de mantenimiento
-        purge_old_messages(days=settings.purge_db_days)
-        purge_old_login_attempts(
-            days=7
-        )  # Limpia logs de intentos de login antiguos
+        bootstrap_db()
     except Exception as e:
         logger.critical("No se pudo inicializar o purgar la base de datos: %s", e)
         # Dependiendo de la criticidad, podrías querer salir o mostrar un error
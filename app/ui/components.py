@@ -6,11 +6,13 @@ Incluye sidebar, chat y herramientas de análisis de código.
 """
 
 import re
+from collections import deque
+from collections.abc import Callable
 from datetime import date, datetime
+from itertools import chain, islice
 from typing import Any
 
 import streamlit as st
-from groq import APIStatusError, Groq
 from streamlit.runtime.uploaded_file_manager import UploadedFile
 
 from app.config import settings
@@ -18,13 +20,14 @@ from app.core import code_tools
 from app.core.code_tools import CodeHealthReport, Diagnostic
 from app.core.export import export_md, export_pdf
 from app.core.file_handler import process_uploaded_file
-from app.core.utils import chunk_text
+from app.core.utils import chunk_bounds
 from app.db.persistence import (
     delete_all_messages,
     load_all_messages,
     load_messages,
     load_messages_between,
     save_message,
+    save_messages,
 )
 from app.llm.llm_handler import get_groq_response
 from app.llm.prompts import AgentMode, get_system_prompt
@@ -41,10 +44,11 @@ def handle_agent_mode_change() -> None:
     )
     selected_mode = AgentMode(selected_mode_value)
 
-    file_context = st.session_state.get("file_context")
-    system_prompt = get_system_prompt(mode=selected_mode, file_context=file_context)
+    system_prompt = get_system_prompt(mode=selected_mode)
 
-    st.session_state.messages = [{"role": "system", "content": system_prompt}]
+    st.session_state.system_prompt = system_prompt
+    st.session_state.messages = deque(maxlen=settings.conversation_window_messages)
+    st.session_state.history_chars = 0
 
     keys_to_delete = [k for k in st.session_state if str(k).startswith("analysis_result_")]
     for key in keys_to_delete:
@@ -88,22 +92,120 @@ def _render_file_uploader() -> None:
                 st.error(error)
             elif content:
                 st.session_state.file_context_full = content
-                st.session_state.file_chunks = None
+                st.session_state.file_full_len = len(content)
+                st.session_state.file_chunk_bounds = None
+                st.session_state.chunk_cfg = None
                 st.session_state.file_chunk_index = 0
                 st.session_state.file_context = content
                 st.success(f"✅ Archivo '{uploaded_file.name}' analizado correctamente.")
 
 
+# Las cargas para exportar se cachean por versión del historial: la versión se
+# incrementa al guardar o borrar mensajes, lo que invalida las entradas previas.
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_load_messages(limit: int, version: int) -> list[dict[str, Any]]:
+    return load_messages(limit=limit)
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_load_all_messages(version: int) -> list[dict[str, Any]]:
+    return load_all_messages()
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_load_messages_between(
+    start: datetime, end: datetime, version: int
+) -> list[dict[str, Any]]:
+    return load_messages_between(start, end)
+
+
+def _bump_history_version() -> None:
+    """Marca el historial como modificado e invalida las cargas cacheadas.
+
+    Además de cambiar la clave, se vacían las cachés: las entradas antiguas no
+    ocupan memoria hasta que expire el TTL y otras sesiones no ven mensajes
+    borrados.
+    """
+    st.session_state.history_version = st.session_state.get("history_version", 0) + 1
+    # Los stubs de `st.cache_data` devuelven el tipo de la función original y
+    # no exponen `.clear`, que sí existe en tiempo de ejecución.
+    _cached_load_messages.clear()  # type: ignore[attr-defined]
+    _cached_load_all_messages.clear()  # type: ignore[attr-defined]
+    _cached_load_messages_between.clear()  # type: ignore[attr-defined]
+
+
+# Formatos de exportación: extensión -> (etiqueta, función de exportación, MIME)
+_EXPORT_FORMATS: dict[str, tuple[str, Callable[..., bytes], str]] = {
+    "md": ("MD", export_md, "text/markdown"),
+    "pdf": ("PDF", export_pdf, "application/pdf"),
+}
+
+
+def _render_lazy_exports(
+    key: str,
+    file_stem: str,
+    load_fn: Callable[[], list[dict[str, Any]]],
+    cache_token: tuple[Any, ...],
+) -> None:
+    """
+    Renderiza los botones de exportación MD/PDF de un conjunto de mensajes.
+
+    El archivo solo se genera al pulsar "Preparar" y se guarda en la sesión junto
+    a `cache_token`; mientras el token no cambie se muestra directamente el botón
+    de descarga sin volver a serializar.
+    """
+    columns = st.columns(len(_EXPORT_FORMATS))
+    for column, (ext, (label, exporter, mime)) in zip(
+        columns, _EXPORT_FORMATS.items(), strict=True
+    ):
+        state_key = f"_export_{key}_{ext}"
+        prepared = st.session_state.get(state_key)
+        if prepared is not None and prepared[0] != cache_token:
+            # La selección o el historial cambiaron: se liberan los bytes obsoletos
+            del st.session_state[state_key]
+            prepared = None
+        if prepared is None and column.button(
+            f"Preparar {label}", key=f"prepare_{key}_{ext}", use_container_width=True
+        ):
+            prepared = (cache_token, exporter(load_fn(), quiet=True))
+            st.session_state[state_key] = prepared
+
+        if prepared is not None:
+            column.download_button(
+                f"⬇️ {label}",
+                data=prepared[1],
+                file_name=f"{file_stem}.{ext}",
+                mime=mime,
+                key=f"download_{key}_{ext}",
+                use_container_width=True,
+            )
+
+
+@st.fragment
 def _render_export_options() -> None:
-    """Renderiza las opciones para exportar el historial de chat."""
+    """Renderiza las opciones para exportar el historial de chat.
+
+    Es un fragmento: cambiar N, las fechas o preparar/descargar una exportación
+    solo re-ejecuta este bloque de la barra lateral.
+    """
     st.subheader("📤 Exportar Chat")
     n: int = int(
         st.number_input(
             "Últimos N mensajes", min_value=5, max_value=2000, value=50, step=5
         )
     )
-    last_n_messages = load_messages(limit=n)
-    all_messages = load_all_messages()
+    version: int = st.session_state.get("history_version", 0)
+    _render_lazy_exports(
+        "last_n",
+        f"chat_ultimos_{n}",
+        lambda: _cached_load_messages(n, version),
+        (version, n),
+    )
+
+    st.caption("Exportar historial completo")
+    _render_lazy_exports(
+        "all", "chat_completo", lambda: _cached_load_all_messages(version), (version,)
+    )
 
     st.caption("Exportar por rango de fechas")
     c_from, c_to = st.columns(2)
@@ -112,14 +214,18 @@ def _render_export_options() -> None:
     end_date: date = c_to.date_input("Hasta", key="export_to_date")  # type: ignore
     end_time = c_to.time_input("Hora hasta", key="export_to_time")
 
-    range_messages: list[dict[str, Any]] = []
     if isinstance(start_date, date) and isinstance(end_date, date):
         start_dt = datetime.combine(start_date, start_time)
         end_dt = datetime.combine(end_date, end_time)
         if start_dt <= end_dt:
-            range_messages = load_messages_between(start_dt, end_dt)
-    
-    # (Aquí se omiten los botones de descarga para brevedad, pero estarían en el código final)
+            _render_lazy_exports(
+                "range",
+                f"chat_{start_dt:%Y%m%d}_{end_dt:%Y%m%d}",
+                lambda: _cached_load_messages_between(start_dt, end_dt, version),
+                (version, start_dt, end_dt),
+            )
+        else:
+            st.caption("La fecha inicial debe ser anterior a la final.")
 
 
 def _render_maintenance_options() -> None:
@@ -131,18 +237,91 @@ def _render_maintenance_options() -> None:
     if st.button("🗑️ Borrar historial (SQLite)", use_container_width=True):
         try:
             delete_all_messages()
-            st.session_state.messages = []
+            _bump_history_version()
+            st.session_state.messages.clear()
+            st.session_state.history_chars = 0
+            st.session_state.messages_seeded = False
+            # Se descarta también el archivo completo: el gestor de partes
+            # reconstruiría `file_context` a partir de él en el siguiente run
             st.session_state.file_context = None
+            st.session_state.file_context_full = None
+            st.session_state.file_full_len = 0
+            st.session_state.file_chunk_bounds = None
+            st.session_state.chunk_cfg = None
+            st.session_state.file_chunk_index = 0
             st.success("Historial borrado.")
             st.rerun()
         except Exception as e:
             st.error(f"No se pudo borrar el historial: {e}")
 
 
+def _get_file_chunk(index: int) -> str:
+    """Extrae bajo demanda el texto de la parte `index` del archivo cargado."""
+    start, end = st.session_state.file_chunk_bounds[index]
+    return str(st.session_state.file_context_full[start:end])
+
+
+def _on_chunk_change() -> None:
+    """Callback: solo actualiza el índice de la parte seleccionada."""
+    st.session_state.file_chunk_index = st.session_state._chunk_idx_ui - 1
+
+
+@st.fragment
 def _render_chunk_manager() -> None:
-    """Gestiona la división del contexto de archivo en partes (chunks)."""
-    # Esta función se mantiene como en la versión anterior
-    pass
+    """Gestiona la división del contexto de archivo en partes (chunks).
+
+    Es un fragmento: navegar entre partes no re-ejecuta el resto de la barra
+    lateral ni vuelve a calcular los límites de las partes.
+    """
+    full_text: str = st.session_state.file_context_full
+
+    st.checkbox(
+        "✂️ Dividir el archivo en partes",
+        key="chunk_by_tokens",
+        help="Envía el archivo por partes de un número máximo de tokens.",
+    )
+    if not st.session_state.chunk_by_tokens:
+        # Los límites calculados se conservan para reactivar la división sin coste
+        st.session_state.file_context = full_text
+        return
+
+    tokens_limit = int(
+        st.number_input(
+            "Tokens por parte", min_value=200, max_value=32000, step=100,
+            key="file_tokens_limit",
+        )
+    )
+    chunk_chars = tokens_limit * 4  # ~4 chars/token
+    # Solo se recalculan los límites si cambia el tamaño de parte o el archivo;
+    # la huella (longitud + extremos del texto) identifica el archivo en O(1).
+    cfg = (
+        chunk_chars,
+        st.session_state.file_full_len,
+        hash(full_text[:64] + full_text[-64:]),
+    )
+    if st.session_state.chunk_cfg != cfg or not st.session_state.file_chunk_bounds:
+        # Solo se guardan los límites (inicio, fin); el texto se extrae bajo demanda
+        st.session_state.file_chunk_bounds = chunk_bounds(full_text, chunk_chars)
+        st.session_state.chunk_cfg = cfg
+    bounds = st.session_state.file_chunk_bounds
+    total = len(bounds)
+    index = min(st.session_state.file_chunk_index, total - 1)
+
+    st.session_state.file_chunk_index = index
+    # El avance automático cambia el índice fuera del widget: sincronizarlo
+    if st.session_state.get("_chunk_idx_ui") != index + 1:
+        st.session_state._chunk_idx_ui = index + 1
+    st.number_input(
+        "Parte", min_value=1, max_value=total, step=1,
+        key="_chunk_idx_ui", on_change=_on_chunk_change,
+    )
+    st.caption(f"Parte {index + 1} de {total}")
+
+    st.session_state.file_context = _get_file_chunk(index)
+
+    st.checkbox(
+        "⏭️ Avanzar automáticamente tras cada respuesta", key="auto_advance_chunks"
+    )
 
 
 # =============================================================================
@@ -209,17 +388,17 @@ def _render_code_actions(content: str, msg_index: int) -> None:
     st.write("---")
     c1, c2 = st.columns([1.5, 2])
 
+    # El clic ya re-ejecuta el fragmento del chat y el resultado se muestra justo
+    # debajo en esta misma ejecución: no hace falta un st.rerun() de toda la app.
     if c1.button("▶️ Ejecutar", key=f"run_code_{msg_index}", use_container_width=True, disabled=not run_command):
         if run_command:
             output, success = code_tools.run_shell_command(run_command)
             st.session_state[analysis_key] = ("Resultado de la Ejecución", output, success)
-            st.rerun()
 
     if c2.button("🩺 Analizar Salud", key=f"health_chk_{msg_index}", use_container_width=True):
         with st.spinner("Analizando la calidad del código..."):
             report = code_tools.analyze_code_health(code_to_analyze)
         st.session_state[analysis_key] = ("Informe de Salud", report, True)
-        st.rerun()
 
     if analysis_key in st.session_state:
         title, result, success = st.session_state.pop(analysis_key)
@@ -239,24 +418,37 @@ def _prepare_chat_messages(window_size: int) -> None:
     """Prepara el prompt del sistema y carga los mensajes iniciales."""
     selected_mode_value = st.session_state.get("agent_mode", AgentMode.CODE_GENERATOR.value)
     selected_mode = AgentMode(selected_mode_value)
-    system_prompt = get_system_prompt(
-        mode=selected_mode, file_context=st.session_state.get("file_context")
-    )
-    if "messages" not in st.session_state or not st.session_state.messages:
-        st.session_state.messages = [
-            {"role": "system", "content": system_prompt},
-            *load_messages(limit=window_size),
-        ]
-    else:
-        st.session_state.messages[0] = {"role": "system", "content": system_prompt}
+    # El prompt del sistema es estático; el archivo adjunto se envía aparte
+    system_prompt = get_system_prompt(mode=selected_mode)
+    st.session_state.system_prompt = system_prompt
+    # El historial se carga de la base de datos una sola vez por sesión. La
+    # deque descarta sola los mensajes más antiguos al superar la ventana.
+    if not st.session_state.get("messages_seeded"):
+        st.session_state.messages = deque(
+            load_messages(limit=window_size), maxlen=window_size
+        )
+        # Total de caracteres del historial, mantenido de forma incremental
+        st.session_state.history_chars = sum(
+            len(m["content"]) for m in st.session_state.messages
+        )
+        st.session_state.messages_seeded = True
+
+
+def _append_to_history(message: dict[str, str]) -> None:
+    """Añade un mensaje a la ventana y actualiza el total de caracteres."""
+    history: deque[dict[str, str]] = st.session_state.messages
+    if len(history) == history.maxlen:
+        # La deque va a expulsar el mensaje más antiguo
+        st.session_state.history_chars -= len(history[0]["content"])
+    history.append(message)
+    st.session_state.history_chars += len(message["content"])
 
 
 def _display_chat_messages(display_window: int) -> None:
     """Muestra los mensajes del historial de chat."""
-    messages_to_render = st.session_state.get("messages", [])[1:]
-    if len(messages_to_render) > display_window:
-        messages_to_render = messages_to_render[-display_window:]
-    
+    history = st.session_state.get("messages", ())
+    messages_to_render = islice(history, max(0, len(history) - display_window), None)
+
     for i, msg in enumerate(messages_to_render):
         avatar = "👤" if msg["role"] == "user" else "🤖"
         with st.chat_message(msg["role"], avatar=avatar):
@@ -265,35 +457,56 @@ def _display_chat_messages(display_window: int) -> None:
                 _render_code_actions(msg["content"], msg_index=i)
 
 
-def _handle_chat_input(window_size: int) -> None:
+def _handle_chat_input() -> None:
     """Gestiona la entrada del usuario y la respuesta del modelo."""
     if prompt := st.chat_input("Escribe tu pregunta sobre Python aquí..."):
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        save_message("user", prompt)
-
-        history = st.session_state.messages[1:]
-        if len(history) > window_size:
-            limit = int(window_size)
-            st.session_state.messages = [st.session_state.messages[0]] + history[-limit:]
+        _append_to_history({"role": "user", "content": prompt})
 
         with st.chat_message("assistant", avatar="🤖"):
-            with st.spinner("🤖 El agente está pensando..."):
+            turn_saved = False
+            try:
                 response_generator = get_groq_response(
-                    st.session_state.client, st.session_state.messages
+                    st.session_state.client,
+                    st.session_state.system_prompt,
+                    st.session_state.messages,
+                    file_context=st.session_state.get("file_context"),
+                    history_chars=st.session_state.history_chars,
                 )
-                full_response = st.write_stream(response_generator)
-                st.session_state.messages.append(
-                    {"role": "assistant", "content": str(full_response)}
+                # El spinner solo cubre la espera del primer fragmento; a partir de
+                # ahí write_stream pinta la respuesta según llega y devuelve el total.
+                with st.spinner("🤖 El agente está pensando..."):
+                    first_chunk = next(response_generator, "")
+                full_response = str(
+                    st.write_stream(chain((first_chunk,), response_generator))
                 )
-                save_message("assistant", str(full_response))
-                if st.session_state.get("auto_advance_chunks") and st.session_state.get("file_chunks"):
-                    if st.session_state.file_chunk_index < len(st.session_state.file_chunks) - 1:
-                        st.session_state.file_chunk_index += 1
-                        st.rerun()
-
-
+                _append_to_history({"role": "assistant", "content": full_response})
+                # Pregunta y respuesta se guardan juntas en una única transacción
+                save_messages((("user", prompt), ("assistant", full_response)))
+                turn_saved = True
+            finally:
+                # Si el stream se corta (p. ej. un rerun desde la barra lateral),
+                # al menos la pregunta del usuario queda guardada
+                if not turn_saved:
+                    save_message("user", prompt)
+                _bump_history_version()
+            if (
+                st.session_state.get("chunk_by_tokens")
+                and st.session_state.get("auto_advance_chunks")
+                and st.session_state.get("file_chunk_bounds")
+            ):
+                last_index = len(st.session_state.file_chunk_bounds) - 1
+                if st.session_state.file_chunk_index < last_index:
+                    st.session_state.file_chunk_index += 1
+                    st.rerun()
+
+
+@st.fragment
 def render_chat_interface() -> None:
-    """Función principal que renderiza toda la interfaz de chat."""
+    """Función principal que renderiza toda la interfaz de chat.
+
+    Se ejecuta como fragmento: la entrada del chat solo re-ejecuta esta función
+    y no el script completo (sesión, CSS, autenticación y barra lateral).
+    """
     st.title("🤖 Agente Experto en Python")
     
     window_size = settings.conversation_window_messages
@@ -301,4 +514,4 @@ def render_chat_interface() -> None:
 
     _prepare_chat_messages(window_size)
     _display_chat_messages(display_window)
-    _handle_chat_input(window_size)
\ No newline at end of file
+    _handle_chat_input()
\ No newline at end of file
@@ -0,0 +1,7 @@
+"""Configuración común de los tests."""
+
+import os
+
+# `app.config` valida los secretos al importarse; los tests no llaman a la API
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+os.environ.setdefault("MASTER_PASSWORD_HASH", "test-hash")
@@ -0,0 +1,29 @@
+"""Tests de la caché de respuestas del LLM."""
+
+from app.llm.llm_cache import ResponseCache
+
+
+def test_make_key_is_stable_across_key_order() -> None:
+    a = ResponseCache.make_key({"model": "m", "temperature": 0.0})
+    b = ResponseCache.make_key({"temperature": 0.0, "model": "m"})
+    assert a == b
+
+
+def test_set_evicts_least_recently_used() -> None:
+    cache = ResponseCache(maxsize=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # "a" pasa a ser la más reciente
+
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+
+def test_clear_empties_the_cache() -> None:
+    cache = ResponseCache()
+    cache.set("a", "1")
+    cache.clear()
+    assert cache.get("a") is None
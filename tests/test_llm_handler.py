@@ -0,0 +1,34 @@
+"""Tests de la agrupación de fragmentos del stream."""
+
+import pytest
+from app.llm import llm_handler
+from app.llm.llm_handler import STREAM_FLUSH_MAX_DELTAS, _coalesce_deltas
+
+
+@pytest.fixture
+def frozen_clock(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Reloj detenido: solo el número de fragmentos provoca un envío."""
+    monkeypatch.setattr(llm_handler.time, "monotonic", lambda: 100.0)
+
+
+def test_coalesce_deltas_keeps_the_full_text(frozen_clock: None) -> None:
+    deltas = [f"t{i} " for i in range(100)]
+    assert "".join(_coalesce_deltas(deltas)) == "".join(deltas)
+
+
+def test_coalesce_deltas_flushes_first_delta_then_batches(frozen_clock: None) -> None:
+    deltas = ["x"] * (1 + STREAM_FLUSH_MAX_DELTAS + 3)
+    chunks = list(_coalesce_deltas(deltas))
+    assert chunks == ["x", "x" * STREAM_FLUSH_MAX_DELTAS, "xxx"]
+
+
+def test_coalesce_deltas_flushes_after_interval(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    ticks = iter([0.0, 0.01, 1.0])
+    monkeypatch.setattr(llm_handler.time, "monotonic", lambda: next(ticks))
+    assert list(_coalesce_deltas(["a", "b", "c"])) == ["a", "bc"]
+
+
+def test_coalesce_deltas_empty_stream() -> None:
+    assert list(_coalesce_deltas([])) == []